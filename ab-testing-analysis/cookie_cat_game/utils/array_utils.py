@@ -0,0 +1,186 @@
+"""
+Compact per-arm metric arrays for the stats functions.
+
+Metric columns are stored as float32 / int32 NumPy arrays, optionally as
+``.npy`` files opened with ``np.memmap``, instead of pandas Series. The
+bootstrap, t-test and outlier functions consume these arrays (or zero-copy
+slices of them) directly, which roughly halves memory per arm.
+
+Only ``array_moments`` (and so ``perform_t_tests_arrays``) and the mean
+bootstrap with the Numba backend stream an arm, so only they accept arms
+larger than RAM. The NumPy backend materializes at least one resample of
+indices, the median bootstrap keeps one resample per core, BCa intervals
+copy the arm to float64 for the jackknife and the IQR outlier quartiles copy
+it for ``np.nanquantile``, so those need the arm to fit in memory.
+"""
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+COMPACT_DTYPES = (np.float32, np.int32)
+MOMENTS_CHUNK_SIZE = 2**20
+ARMS_FILE = "arms.json"
+
+
+def to_compact_array(values, dtype: Optional[np.dtype] = None) -> np.ndarray:
+    """
+    Convert a metric column to a compact 1-D NumPy array.
+
+    Arrays that are already float32 / int32 (including memory-mapped ones)
+    are returned without copying. Integers are narrowed to int32 when all
+    values fit, other numbers are stored as float32.
+
+    Parameters
+    ----------
+    values : array-like
+        Metric values, e.g. a pandas Series.
+    dtype : np.dtype, optional
+        Target dtype, overriding the automatic choice.
+
+    Returns
+    -------
+    np.ndarray
+        The compact array.
+    """
+    if isinstance(values, pd.Series):
+        values = values.to_numpy()
+    values = np.asarray(values)
+    if dtype is None:
+        if values.dtype in COMPACT_DTYPES:
+            return values
+        dtype = np.float32
+        if np.issubdtype(values.dtype, np.integer) or values.dtype == bool:
+            limits = np.iinfo(np.int32)
+            if values.size == 0 or (
+                values.min() >= limits.min and values.max() <= limits.max
+            ):
+                dtype = np.int32
+            else:
+                dtype = values.dtype
+    return values.astype(dtype, copy=False)
+
+
+def _arm_path(directory: Path, arm) -> Path:
+    label = "".join(c if c.isalnum() or c in "-_." else "_" for c in str(arm))
+    return directory / f"{label}.npy"
+
+
+def save_arm_arrays(
+    df: pd.DataFrame,
+    arm_col: str,
+    value_col: str,
+    directory: str,
+    dtype: Optional[np.dtype] = None,
+) -> dict:
+    """
+    Write one compact ``.npy`` file per arm, ready to be memory-mapped.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        User-level data.
+    arm_col : str
+        Column identifying the arm, e.g. "version" or "Promotion".
+    value_col : str
+        Metric column, e.g. "sum_gamerounds".
+    directory : str
+        Output directory, created if needed.
+    dtype : np.dtype, optional
+        Storage dtype, see ``to_compact_array``.
+
+    Returns
+    -------
+    dict
+        File path per arm.
+
+    The arm labels are also written to ``arms.json``, so ``load_arm_arrays``
+    returns the same keys (e.g. int ``1`` rather than the file name ``"1"``).
+    Labels that map to the same file name (e.g. ``1`` and ``"1"``, or
+    ``"gate 30"`` and ``"gate_30"``) raise a ValueError.
+    """
+    directory = Path(directory)
+    groups = [
+        (arm.item() if isinstance(arm, np.generic) else arm, values)
+        for arm, values in df.groupby(arm_col, sort=True)[value_col]
+    ]
+    paths = {arm: _arm_path(directory, arm) for arm, _ in groups}
+    if len(set(paths.values())) < len(paths):
+        raise ValueError(
+            f"Arms {list(paths)} map to clashing file names "
+            f"{[path.name for path in paths.values()]}; rename the arms."
+        )
+
+    directory.mkdir(parents=True, exist_ok=True)
+    for arm, values in groups:
+        np.save(paths[arm], to_compact_array(values, dtype))
+    with open(directory / ARMS_FILE, "w") as f:
+        json.dump([[arm, path.name] for arm, path in paths.items()], f, indent=2)
+    return paths
+
+
+def load_arm_arrays(directory: str, arms: Optional[list] = None) -> dict:
+    """
+    Memory-map the per-arm arrays written by ``save_arm_arrays``.
+
+    Parameters
+    ----------
+    directory : str
+        Directory holding the ``.npy`` files.
+    arms : list, optional
+        Arms to load. Defaults to every arm written by ``save_arm_arrays``.
+
+    Returns
+    -------
+    dict
+        Read-only ``np.memmap`` per arm, keyed by the arm labels recorded in
+        ``arms.json`` (the same keys ``save_arm_arrays`` returned).
+    """
+    directory = Path(directory)
+    with open(directory / ARMS_FILE) as f:
+        paths = {arm: directory / name for arm, name in json.load(f)}
+    if arms is not None:
+        missing = [arm for arm in arms if arm not in paths]
+        if missing:
+            raise KeyError(f"Arms {missing} are not stored in {directory}.")
+        paths = {arm: paths[arm] for arm in arms}
+    return {arm: np.load(path, mmap_mode="r") for arm, path in paths.items()}
+
+
+def array_moments(
+    values: np.ndarray, chunk_size: int = MOMENTS_CHUNK_SIZE
+) -> tuple[int, float, float]:
+    """
+    Count, mean and sample variance computed chunk by chunk in float64, so
+    memory-mapped arrays are streamed instead of loaded as a whole.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        1-D metric values.
+    chunk_size : int
+        Number of values read per chunk.
+
+    Returns
+    -------
+    tuple[int, float, float]
+        The count, mean and sample variance (ddof=1).
+    """
+    n = 0
+    mean = 0.0
+    m2 = 0.0
+    for start in range(0, len(values), chunk_size):
+        chunk = np.asarray(values[start:start + chunk_size], dtype=np.float64)
+        chunk_n = len(chunk)
+        chunk_mean = chunk.mean()
+        chunk_m2 = np.sum((chunk - chunk_mean) ** 2)
+        # Chan et al. pairwise update of the running moments.
+        delta = chunk_mean - mean
+        total = n + chunk_n
+        mean += delta * chunk_n / total
+        m2 += chunk_m2 + delta**2 * n * chunk_n / total
+        n = total
+    variance = m2 / (n - 1) if n > 1 else np.nan
+    return n, mean, variance
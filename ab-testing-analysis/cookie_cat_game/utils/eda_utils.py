@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 
+from .kernel_utils import outside_bounds_mask
+
 
 def check_missing_values(df):
     """
@@ -60,16 +62,46 @@ def find_outlier_rows_by_iqr(df: pd.DataFrame, columns: list = None) -> pd.DataF
     """
     if columns is None:
         columns = df.select_dtypes(include=["int64", "float64"]).columns.tolist()
-    outlier_mask = pd.Series(False, index=df.index)
+    if not columns:
+        return df.iloc[:0]
+
+    quartiles = df[columns].quantile([0.25, 0.75])
+    Q1 = quartiles.loc[0.25].to_numpy()
+    Q3 = quartiles.loc[0.75].to_numpy()
+    IQR = Q3 - Q1
+
+    lower_bound = Q1 - 1.5 * IQR
+    upper_bound = Q3 + 1.5 * IQR
+    outlier_mask = outside_bounds_mask(
+        df[columns].to_numpy(dtype=float), lower_bound, upper_bound
+    )
 
-    for col in columns:
-        Q1 = df[col].quantile(0.25)
-        Q3 = df[col].quantile(0.75)
-        IQR = Q3 - Q1
+    return df[outlier_mask]
+
+
+def find_outlier_mask_by_iqr(values: np.ndarray, threshold: float = 1.5) -> np.ndarray:
+    """
+    Flag outliers in a 1-D metric array (e.g. a compact or memory-mapped arm
+    from array_utils) using the Interquartile Range (IQR) method, without
+    wrapping it in a DataFrame. NaN values are ignored, as in the DataFrame
+    variant. np.nanquantile copies the array, so it must fit in memory.
 
-        lower_bound = Q1 - 1.5 * IQR
-        upper_bound = Q3 + 1.5 * IQR
-        col_outlier_mask = (df[col] < lower_bound) | (df[col] > upper_bound)
-        outlier_mask |= col_outlier_mask
+    Parameters:
+    ----------
+    values : np.ndarray
+        The metric values of one arm.
+    threshold : float
+        IQR multiplier, 1.5 by default.
+
+    Returns:
+    -------
+    np.ndarray
+        Boolean mask, True for the outlying values.
+    """
+    values = np.asarray(values)
+    Q1, Q3 = np.nanquantile(values, [0.25, 0.75])
+    IQR = Q3 - Q1
 
-    return df[outlier_mask]
\ No newline at end of file
+    lower_bound = Q1 - threshold * IQR
+    upper_bound = Q3 + threshold * IQR
+    return outside_bounds_mask(values[:, np.newaxis], [lower_bound], [upper_bound])
@@ -0,0 +1,187 @@
+"""
+Compute kernels for resampling and outlier masking.
+
+When Numba is installed the kernels are JIT-compiled and run in parallel
+across cores. Each resample is drawn and reduced inside the kernel, so neither
+an index block nor a resampled float array is materialized. Without Numba the
+same functions fall back to pure NumPy.
+
+Resample ``i`` is defined by a 64-bit row seed drawn from the caller's NumPy
+generator: its ``j``-th index is the SplitMix64 output for counter ``j`` of
+that seed, reduced modulo the sample size. Both backends compute exactly the
+same indices and the NumPy means add them up in the kernel's sequential
+order, so under the same seed both backends return identical results.
+
+Set ``USE_NUMBA = False`` to force the NumPy backend.
+"""
+import numpy as np
+
+try:
+    from numba import njit, prange
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+USE_NUMBA = NUMBA_AVAILABLE
+RESAMPLE_BLOCK_ELEMENTS = 2**22
+
+SPLITMIX_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+SPLITMIX_MULTIPLIER_1 = np.uint64(0xBF58476D1CE4E5B9)
+SPLITMIX_MULTIPLIER_2 = np.uint64(0x94D049BB133111EB)
+
+
+if NUMBA_AVAILABLE:
+
+    @njit(cache=True)
+    def _splitmix_index(seed, counter, n):
+        z = seed + np.uint64(counter + 1) * SPLITMIX_GAMMA
+        z = (z ^ (z >> np.uint64(30))) * SPLITMIX_MULTIPLIER_1
+        z = (z ^ (z >> np.uint64(27))) * SPLITMIX_MULTIPLIER_2
+        z = z ^ (z >> np.uint64(31))
+        return np.intp(z % np.uint64(n))
+
+    @njit(parallel=True, cache=True)
+    def _resample_means_numba(values, row_seeds, sample_size):
+        n = values.shape[0]
+        result = np.empty(row_seeds.shape[0])
+        for row in prange(row_seeds.shape[0]):
+            seed = row_seeds[row]
+            total = 0.0
+            for col in range(sample_size):
+                total += values[_splitmix_index(seed, col, n)]
+            result[row] = total / sample_size
+        return result
+
+    @njit(parallel=True, cache=True)
+    def _resample_medians_numba(values, row_seeds, sample_size):
+        n = values.shape[0]
+        result = np.empty(row_seeds.shape[0])
+        for row in prange(row_seeds.shape[0]):
+            seed = row_seeds[row]
+            buffer = np.empty(sample_size, dtype=values.dtype)
+            for col in range(sample_size):
+                buffer[col] = values[_splitmix_index(seed, col, n)]
+            result[row] = np.median(buffer)
+        return result
+
+    @njit(parallel=True, cache=True)
+    def _outside_bounds_numba(values, lower, upper):
+        n_rows, n_cols = values.shape
+        mask = np.zeros(n_rows, dtype=np.bool_)
+        for row in prange(n_rows):
+            for col in range(n_cols):
+                value = values[row, col]
+                if value < lower[col] or value > upper[col]:
+                    mask[row] = True
+                    break
+        return mask
+
+
+def draw_row_seeds(rng: np.random.Generator, n_rows: int) -> np.ndarray:
+    """
+    Draw one 64-bit seed per resample from ``rng``.
+    """
+    return rng.integers(0, np.iinfo(np.uint64).max, size=n_rows, dtype=np.uint64)
+
+
+def resample_indices(row_seeds: np.ndarray, sample_size: int, n: int) -> np.ndarray:
+    """
+    The index block the kernels draw from ``row_seeds``, one resample per row.
+    Only the NumPy backend materializes it.
+    """
+    counters = np.arange(1, sample_size + 1, dtype=np.uint64)
+    z = row_seeds[:, np.newaxis] + counters * SPLITMIX_GAMMA
+    z = (z ^ (z >> np.uint64(30))) * SPLITMIX_MULTIPLIER_1
+    z = (z ^ (z >> np.uint64(27))) * SPLITMIX_MULTIPLIER_2
+    z ^= z >> np.uint64(31)
+    return (z % np.uint64(n)).astype(np.intp)
+
+
+def resample_batch_size(n: int, n_resamples: int) -> int:
+    """
+    Number of resamples of size ``n`` per batch that keeps the NumPy
+    backend's index block below ``RESAMPLE_BLOCK_ELEMENTS`` elements.
+    """
+    return max(1, min(n_resamples, RESAMPLE_BLOCK_ELEMENTS // max(n, 1)))
+
+
+def resample_means(
+    values: np.ndarray, row_seeds: np.ndarray, sample_size: int
+) -> np.ndarray:
+    """
+    Mean of one resample of ``sample_size`` values per row seed.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        1-D sample values.
+    row_seeds : np.ndarray
+        One uint64 seed per resample, see ``draw_row_seeds``.
+    sample_size : int
+        Number of values drawn with replacement per resample.
+
+    Returns
+    -------
+    np.ndarray
+        One mean per resample.
+    """
+    if USE_NUMBA:
+        return _resample_means_numba(values, row_seeds, sample_size)
+    indices = resample_indices(row_seeds, sample_size, len(values))
+    # A sequential sum (rather than NumPy's pairwise one) matches the kernel
+    # bit for bit.
+    totals = np.add.accumulate(values[indices], axis=1, dtype=np.float64)[:, -1]
+    return totals / sample_size
+
+
+def resample_medians(
+    values: np.ndarray, row_seeds: np.ndarray, sample_size: int
+) -> np.ndarray:
+    """
+    Median of one resample of ``sample_size`` values per row seed.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        1-D sample values.
+    row_seeds : np.ndarray
+        One uint64 seed per resample, see ``draw_row_seeds``.
+    sample_size : int
+        Number of values drawn with replacement per resample.
+
+    Returns
+    -------
+    np.ndarray
+        One median per resample.
+    """
+    if USE_NUMBA:
+        return _resample_medians_numba(values, row_seeds, sample_size)
+    indices = resample_indices(row_seeds, sample_size, len(values))
+    return np.median(values[indices], axis=1)
+
+
+def outside_bounds_mask(
+    values: np.ndarray, lower: np.ndarray, upper: np.ndarray
+) -> np.ndarray:
+    """
+    Rows with a value below ``lower`` or above ``upper`` in any column.
+    NaN values never count as outside.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        2-D array, one column per variable.
+    lower, upper : np.ndarray
+        Per-column bounds.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean mask, one entry per row.
+    """
+    lower = np.asarray(lower, dtype=float)
+    upper = np.asarray(upper, dtype=float)
+    if USE_NUMBA:
+        return _outside_bounds_numba(values, lower, upper)
+    return ((values < lower) | (values > upper)).any(axis=1)
@@ -0,0 +1,206 @@
+"""
+Sample Ratio Mismatch (SRM) checks for every segment of one or many experiments.
+
+All segments are tested at once: the arm counts are built as a single
+segment x arm matrix and the chi-square / G-test statistics are computed on
+the whole matrix with NumPy.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from scipy.special import xlogy
+from scipy.stats import chi2
+from statsmodels.stats.multitest import multipletests
+
+
+def _share_matrix(counts: pd.DataFrame, expected_ratios) -> pd.DataFrame:
+    """
+    Expected share of every arm column for every row of ``counts``.
+    """
+    if expected_ratios is None:
+        ratios = pd.DataFrame(1.0, index=counts.index, columns=counts.columns)
+    elif isinstance(expected_ratios, pd.DataFrame):
+        ratios = expected_ratios.reindex(
+            index=counts.index, columns=counts.columns, fill_value=0.0
+        )
+    else:
+        ratios = pd.DataFrame(
+            [[expected_ratios.get(arm, 0.0) for arm in counts.columns]],
+            columns=counts.columns,
+        )
+        ratios = ratios.loc[[0] * len(counts)].set_axis(counts.index)
+    ratios = ratios.astype(float).fillna(0.0)
+    row_totals = ratios.sum(axis=1)
+    if (row_totals <= 0).any():
+        raise ValueError("Every segment needs at least one arm with a positive ratio.")
+    return ratios.div(row_totals, axis=0)
+
+
+def srm_from_counts(
+    counts: pd.DataFrame,
+    expected_ratios=None,
+    test: str = "chi2",
+    correction: Optional[str] = "holm",
+    alpha: float = 0.05,
+) -> pd.DataFrame:
+    """
+    Runs the SRM test on a segment x arm matrix of user counts.
+
+    Parameters
+    ----------
+    counts : pd.DataFrame
+        One row per segment and one column per arm, holding user counts.
+    expected_ratios : dict or pd.DataFrame, optional
+        Planned allocation per arm, e.g. {"gate_30": 1, "gate_40": 1}. Ratios
+        are normalized, so weights and shares are both accepted. A DataFrame
+        aligned with ``counts`` gives separate ratios per row (e.g. per
+        experiment). Arms without a ratio are planned to get no users, so any
+        user in them is a mismatch. Defaults to an equal split across the
+        columns of ``counts``.
+    test : str
+        "chi2" for Pearson's chi-square test or "g" for the G-test.
+    correction : str, optional
+        Multiple-testing correction passed to
+        ``statsmodels.stats.multitest.multipletests`` (e.g. "holm",
+        "bonferroni", "fdr_bh"). None disables the correction.
+    alpha : float
+        Significance level for flagging a mismatch.
+
+    Returns
+    -------
+    pd.DataFrame
+        The counts plus "total", "statistic", "p_value", "p_value_adjusted"
+        and "srm" (True where a mismatch is detected).
+    """
+    if test not in ("chi2", "g"):
+        raise ValueError(f"Unknown test '{test}', use 'chi2' or 'g'.")
+    if isinstance(expected_ratios, dict):
+        arms = list(counts.columns) + [
+            arm for arm in expected_ratios if arm not in counts.columns
+        ]
+        counts = counts.reindex(columns=arms, fill_value=0)
+
+    observed = counts.to_numpy(dtype=float)
+    shares = _share_matrix(counts, expected_ratios).to_numpy()
+    totals = observed.sum(axis=1)
+    expected = totals[:, np.newaxis] * shares
+
+    # Arms planned to receive no traffic only contribute when they got users,
+    # which is a mismatch regardless of the other arms.
+    planned = shares > 0
+    unplanned_users = np.sum(np.where(planned, 0.0, observed), axis=1) > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if test == "chi2":
+            terms = (observed - expected) ** 2 / expected
+        else:
+            terms = 2 * xlogy(observed, observed / expected)
+    statistic = np.sum(np.where(planned, terms, 0.0), axis=1)
+    statistic[unplanned_users] = np.inf
+
+    p_value = chi2.sf(statistic, df=np.maximum(planned.sum(axis=1) - 1, 1))
+    # Segments without users cannot be tested.
+    p_value[totals == 0] = np.nan
+
+    p_value_adjusted = p_value.copy()
+    testable = ~np.isnan(p_value)
+    if correction is not None and testable.any():
+        p_value_adjusted[testable] = multipletests(
+            p_value[testable], alpha=alpha, method=correction
+        )[1]
+
+    result = counts.copy()
+    result["total"] = totals.astype(np.int64)
+    result["statistic"] = statistic
+    result["p_value"] = p_value
+    result["p_value_adjusted"] = p_value_adjusted
+    result["srm"] = p_value_adjusted < alpha
+    return result
+
+
+def srm_check(
+    df: pd.DataFrame,
+    arm_col: str,
+    segment_cols: Optional[list[str]] = None,
+    expected_ratios: Optional[dict] = None,
+    experiment_col: Optional[str] = None,
+    test: str = "chi2",
+    correction: Optional[str] = "holm",
+    alpha: float = 0.05,
+) -> pd.DataFrame:
+    """
+    Checks every segment of a user-level DataFrame for Sample Ratio Mismatch.
+
+    The arm x segment crosstab is built in one groupby pass. Pass
+    ``experiment_col`` to check several experiments at once: each segment is
+    then tested only against the arms of its own experiment. With no segment
+    columns a single overall test is run.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        One row per user.
+    arm_col : str
+        Column holding the assigned arm (e.g. "version").
+    segment_cols : list of str, optional
+        Columns defining the segments (e.g. ["country", "platform", "day"]).
+    expected_ratios : dict, optional
+        Planned allocation per arm, see ``srm_from_counts``. With
+        ``experiment_col`` it may also map each experiment to its own ratios,
+        e.g. {"exp_a": {"a": 1, "b": 1}}. Experiments without ratios default
+        to an equal split across the arms observed in that experiment.
+    experiment_col : str, optional
+        Column holding the experiment id. It is added to the segments.
+    test, correction, alpha
+        See ``srm_from_counts``.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per segment, see ``srm_from_counts``.
+    """
+    segment_cols = list(segment_cols or [])
+    if experiment_col is not None and experiment_col not in segment_cols:
+        segment_cols = [experiment_col] + segment_cols
+
+    if segment_cols:
+        counts = (
+            df.groupby(segment_cols + [arm_col], observed=True, sort=False)
+            .size()
+            .unstack(arm_col, fill_value=0)
+        )
+    else:
+        counts = df[arm_col].value_counts().to_frame().T
+        counts.index = ["overall"]
+
+    if experiment_col is not None:
+        per_experiment = expected_ratios is not None and all(
+            isinstance(ratios, dict) for ratios in expected_ratios.values()
+        )
+        if expected_ratios is not None:
+            # Planned arms that got no users at all still need a column, or
+            # the remaining arms would be treated as the whole allocation.
+            planned_arms = (
+                [arm for ratios in expected_ratios.values() for arm in ratios]
+                if per_experiment
+                else list(expected_ratios)
+            )
+            missing = [arm for arm in planned_arms if arm not in counts.columns]
+            counts = counts.reindex(
+                columns=list(counts.columns) + list(dict.fromkeys(missing)),
+                fill_value=0,
+            )
+        experiment_arms = counts.groupby(level=experiment_col, sort=False).sum() > 0
+        ratios = experiment_arms.astype(float)
+        for experiment in ratios.index:
+            if per_experiment and experiment in expected_ratios:
+                planned = expected_ratios[experiment]
+            elif expected_ratios is not None and not per_experiment:
+                planned = expected_ratios
+            else:
+                continue
+            ratios.loc[experiment] = [planned.get(arm, 0.0) for arm in ratios.columns]
+        experiments = counts.index.get_level_values(experiment_col)
+        expected_ratios = ratios.loc[experiments].set_axis(counts.index)
+
+    return srm_from_counts(counts, expected_ratios, test, correction, alpha)
@@ -10,25 +10,227 @@ tuple: A tuple containing the mean of the bootstrap samples, the lower bound of
        and the upper bound of the confidence interval.
 """
 import numpy as np
+from scipy.stats import beta, norm
 
-def bootstrap_mean_ci(group, sample_size, ci=95, n_bootstraps=1000):
+from .cache_utils import cached_result
+from .kernel_utils import draw_row_seeds, resample_batch_size, resample_means
+
+
+def _check_jackknife_size(n):
+    """
+    The jackknife needs at least two observations to leave one out.
+    """
+    if n < 2:
+        raise ValueError(
+            f"BCa intervals need at least 2 observations per group, got {n}."
+        )
+
+
+def jackknife_means(values):
+    """
+    Calculates the leave-one-out means in O(n) from the total sum.
+
+    Parameters:
+    values (array-like): The sample values.
+
+    Returns:
+    ndarray: The mean of the sample with observation i removed, for every i.
+    """
+    values = np.asarray(values, dtype=float)
+    _check_jackknife_size(len(values))
+    return (values.sum() - values) / (len(values) - 1)
+
+
+def _bca_acceleration(jackknife_samples):
+    """
+    Calculates the acceleration term from the jackknife values of each
+    independent sample.
+    """
+    numerator = 0.0
+    denominator = 0.0
+    for jackknife in jackknife_samples:
+        deviations = jackknife.mean() - jackknife
+        numerator += np.sum(deviations**3)
+        denominator += np.sum(deviations**2)
+    if denominator == 0:
+        return 0.0
+    return numerator / (6 * denominator**1.5)
+
+
+def _confidence_bounds(bootstrap_stats, ci, method, theta_hat=None, jackknife_samples=None):
+    """
+    Calculates percentile or BCa (bias-corrected and accelerated) interval bounds.
+    """
+    bootstrap_stats = np.asarray(bootstrap_stats)
+    tail = (100 - ci) / 2
+    if method == "percentile":
+        return (
+            np.percentile(bootstrap_stats, tail),
+            np.percentile(bootstrap_stats, 100 - tail),
+        )
+    if method != "bca":
+        raise ValueError(f"Unknown method '{method}', use 'percentile' or 'bca'.")
+
+    n = len(bootstrap_stats)
+    proportion = (
+        np.sum(bootstrap_stats < theta_hat) + 0.5 * np.sum(bootstrap_stats == theta_hat)
+    ) / n
+    z0 = norm.ppf(np.clip(proportion, 0.5 / n, 1 - 0.5 / n))
+    acceleration = _bca_acceleration(jackknife_samples)
+    z = norm.ppf([tail / 100, 1 - tail / 100])
+    denominator = 1 - acceleration * (z0 + z)
+    if np.any(denominator <= 0):
+        # The BCa map is no longer monotone and would return lower > upper.
+        raise ValueError(
+            f"BCa is undefined for acceleration {acceleration:.3g} and bias "
+            f"correction {z0:.3g}; use method='percentile'."
+        )
+    adjusted = norm.cdf(z0 + (z0 + z) / denominator)
+    ci_lower, ci_upper = np.percentile(bootstrap_stats, 100 * adjusted)
+    return ci_lower, ci_upper
+
+
+@cached_result
+def bootstrap_mean_ci(group, sample_size, ci=95, n_bootstraps=1000, seed=None,
+                      method="percentile"):
     """
     Calculates the bootstrap mean and confidence interval for a given group.
 
     Parameters:
-    group (Series): The data to bootstrap.
+    group (Series or ndarray): The data to bootstrap. Compact or memory-mapped
+        arrays from array_utils are used without copying. Only the percentile
+        method with the Numba backend streams it; otherwise it must fit in memory.
     sample_size (int): The size of each bootstrap sample.
     ci (int): The confidence interval percentage.
     n_bootstraps (int): The number of bootstrap samples to generate.
+    seed (int, optional): Seed for the random generator. Seeded calls are cached,
+        see cache_utils.cached_result.
+    method (str): "percentile" or "bca". BCa intervals correct for bias and
+        skewness (e.g. sum_gamerounds) and keep their coverage with fewer replicates.
+        BCa is only defined for resamples of the full group, so it requires
+        sample_size == len(group).
 
     Returns:
     tuple: The mean, lower bound, and upper bound of the confidence interval.
     """
-    bootstrapped_means = []
-    for _ in range(n_bootstraps):
-        sample = np.random.choice(group, size=sample_size, replace=True)
-        bootstrapped_means.append(np.mean(sample))
+    values = np.asarray(group)
+    if method == "bca":
+        _check_jackknife_size(len(values))
+        if sample_size != len(values):
+            raise ValueError(
+                f"BCa needs sample_size == len(group) ({len(values)}), got "
+                f"{sample_size}; use method='percentile' for m-out-of-n resampling."
+            )
+    rng = np.random.default_rng(seed)
+    bootstrapped_means = np.empty(n_bootstraps)
+    batch_size = resample_batch_size(sample_size, n_bootstraps)
+    for start in range(0, n_bootstraps, batch_size):
+        size = min(batch_size, n_bootstraps - start)
+        row_seeds = draw_row_seeds(rng, size)
+        bootstrapped_means[start:start + size] = resample_means(
+            values, row_seeds, sample_size
+        )
     mean = np.mean(bootstrapped_means)
-    lower_bound = np.percentile(bootstrapped_means, (100 - ci) / 2)
-    upper_bound = np.percentile(bootstrapped_means, 100 - (100 - ci) / 2)
+    lower_bound, upper_bound = _confidence_bounds(
+        bootstrapped_means,
+        ci,
+        method,
+        theta_hat=np.mean(values) if method == "bca" else None,
+        jackknife_samples=[jackknife_means(values)] if method == "bca" else None,
+    )
     return mean, lower_bound, upper_bound
+
+
+PERMUTATION_BLOCK_ELEMENTS = 2**23
+
+
+def _group_difference(block, n1, statistic):
+    """
+    Evaluates the group-1 minus group-2 statistic for every row of a 2-D block
+    whose first n1 columns hold group 1.
+    """
+    if statistic == "mean":
+        sum1 = block[:, :n1].sum(axis=1)
+        sum2 = block.sum(axis=1) - sum1
+        return sum1 / n1 - sum2 / (block.shape[1] - n1)
+    if statistic == "median":
+        return np.median(block[:, :n1], axis=1) - np.median(block[:, n1:], axis=1)
+    raise ValueError(f"Unknown statistic '{statistic}', use 'mean' or 'median'.")
+
+
+@cached_result
+def permutation_test(group1, group2, statistic="mean", alternative="two-sided",
+                     n_permutations=10000, batch_size=500, alpha=0.05,
+                     early_stopping=True, error_rate=0.001, seed=None):
+    """
+    Permutation test for the difference in means or medians of two groups
+    (e.g. gate_40 vs gate_30).
+
+    Label shuffles are generated in batches and the statistic is evaluated on
+    the whole 2-D batch at once. With early_stopping the test stops as soon as
+    a Clopper-Pearson interval for the Monte Carlo p-value lies entirely above
+    or below alpha; the interval level is Bonferroni-adjusted over all batches
+    so the decision is wrong with probability at most error_rate.
+
+    Parameters:
+    group1 (Series): Data for the first group.
+    group2 (Series): Data for the second group.
+    statistic (str): Either "mean" or "median".
+    alternative (str): "two-sided", "greater" (group1 > group2) or "less".
+    n_permutations (int): The maximum number of permutations.
+    batch_size (int): The number of permutations per batch. It is reduced for
+        large groups to bound memory use.
+    alpha (float): The significance level used by the stopping rule.
+    early_stopping (bool): Whether to stop once the decision at alpha is settled.
+    error_rate (float): The probability that early stopping reaches the wrong decision.
+    seed (int, optional): Seed for the random generator.
+
+    Returns:
+    tuple: The observed difference (group1 - group2), the permutation p-value
+        and the number of permutations evaluated.
+    """
+    if alternative not in ("two-sided", "greater", "less"):
+        raise ValueError(
+            f"Unknown alternative '{alternative}', use 'two-sided', 'greater' or 'less'."
+        )
+    values1 = np.asarray(group1)
+    values2 = np.asarray(group2)
+    n1 = len(values1)
+    pooled = np.concatenate([values1, values2])
+    observed_diff = float(_group_difference(pooled[np.newaxis, :], n1, statistic)[0])
+    # Permuted statistics are summed in a different order than the observed
+    # one, so exact ties can differ by rounding; compare with a relative
+    # tolerance as scipy.stats.permutation_test does.
+    tolerance = abs(observed_diff) * 100 * np.finfo(float).eps
+
+    batch_size = max(1, min(batch_size, PERMUTATION_BLOCK_ELEMENTS // len(pooled)))
+    n_batches = -(-n_permutations // batch_size)
+    tail = (error_rate / n_batches) / 2
+    rng = np.random.default_rng(seed)
+
+    n_extreme = 0
+    n_used = 0
+    while n_used < n_permutations:
+        size = min(batch_size, n_permutations - n_used)
+        block = rng.permuted(np.broadcast_to(pooled, (size, len(pooled))), axis=1)
+        diffs = _group_difference(block, n1, statistic)
+        if alternative == "two-sided":
+            n_extreme += int(np.sum(np.abs(diffs) >= abs(observed_diff) - tolerance))
+        elif alternative == "greater":
+            n_extreme += int(np.sum(diffs >= observed_diff - tolerance))
+        else:
+            n_extreme += int(np.sum(diffs <= observed_diff + tolerance))
+        n_used += size
+
+        if early_stopping and n_used < n_permutations:
+            lower = beta.ppf(tail, n_extreme, n_used - n_extreme + 1) if n_extreme else 0.0
+            upper = (
+                beta.ppf(1 - tail, n_extreme + 1, n_used - n_extreme)
+                if n_extreme < n_used
+                else 1.0
+            )
+            if upper < alpha or lower > alpha:
+                break
+
+    p_value = (n_extreme + 1) / (n_used + 1)
+    return observed_diff, p_value, n_used
@@ -0,0 +1,278 @@
+"""
+Memoization of expensive statistical computations (bootstrap, resampling tests).
+
+Results are keyed by a content fingerprint of the input data plus every call
+parameter, and stored in two tiers: an in-memory LRU and an on-disk store with
+size-based eviction. Changing a single value of the input data changes the
+fingerprint, so stale results are never returned. Only calls with a fixed
+integer seed are cached, so reports should pass one (e.g. ``seed=SEED`` in
+the notebooks) for re-renders to be served from the cache.
+"""
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = "1"
+DEFAULT_CACHE_DIR = Path(
+    os.environ.get("AB_TESTING_CACHE_DIR", Path.home() / ".cache" / "ab_testing")
+)
+DEFAULT_MEMORY_ITEMS = 256
+DEFAULT_DISK_BYTES = 256 * 1024 * 1024
+HASH_CHUNK_BYTES = 16 * 1024 * 1024
+
+
+def fingerprint(value: Any) -> str:
+    """
+    Compute a fast content fingerprint of a value.
+
+    Arrays and pandas objects are hashed by dtype, shape and raw bytes (the
+    index of a Series is ignored, only the values matter). Other values are
+    hashed by their ``repr``.
+
+    Parameters
+    ----------
+    value : Any
+        Value to fingerprint.
+
+    Returns
+    -------
+    str
+        Hex digest identifying the content of the value.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    _update_hash(hasher, value)
+    return hasher.hexdigest()
+
+
+def _update_hash(hasher: "hashlib._Hash", value: Any) -> None:
+    if isinstance(value, pd.DataFrame):
+        hasher.update(b"DataFrame")
+        hasher.update(repr(list(value.columns)).encode())
+        for column in value.columns:
+            _update_hash(hasher, value[column])
+    elif isinstance(value, pd.Series):
+        _update_hash(hasher, value.to_numpy())
+    elif isinstance(value, np.ndarray):
+        if value.dtype == object:
+            hasher.update(repr(value.tolist()).encode())
+            return
+        hasher.update(f"ndarray:{value.dtype.str}:{value.shape}".encode())
+        flat = np.ascontiguousarray(value).reshape(-1).view(np.uint8)
+        for start in range(0, flat.size, HASH_CHUNK_BYTES):
+            hasher.update(memoryview(flat[start:start + HASH_CHUNK_BYTES]))
+    elif isinstance(value, (list, tuple)):
+        hasher.update(f"{type(value).__name__}:{len(value)}".encode())
+        for item in value:
+            _update_hash(hasher, item)
+    elif isinstance(value, dict):
+        hasher.update(f"dict:{len(value)}".encode())
+        for key in sorted(value, key=repr):
+            hasher.update(repr(key).encode())
+            _update_hash(hasher, value[key])
+    else:
+        hasher.update(f"{type(value).__name__}:{value!r}".encode())
+
+
+class ResultCache:
+    """
+    Two-tier (memory LRU + disk) store for computation results.
+
+    Parameters
+    ----------
+    cache_dir : str or Path, optional
+        Directory for the disk tier. Defaults to ``DEFAULT_CACHE_DIR``, which
+        can be overridden with the ``AB_TESTING_CACHE_DIR`` environment variable.
+    max_memory_items : int
+        Maximum number of results held in memory.
+    max_disk_bytes : int
+        Maximum total size of the disk tier. Least recently used entries are
+        removed first once the limit is exceeded. Use 0 to disable the disk tier.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_memory_items: int = DEFAULT_MEMORY_ITEMS,
+        max_disk_bytes: int = DEFAULT_DISK_BYTES,
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else DEFAULT_CACHE_DIR
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached result for ``key``, or ``default`` if missing."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        path = self._path(key)
+        if self.max_disk_bytes <= 0 or not path.exists():
+            return default
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return default
+        # Refresh the modification time so that disk eviction is LRU.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store ``value`` under ``key`` in both tiers."""
+        self._remember(key, value)
+        if self.max_disk_bytes <= 0:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._evict_disk()
+
+    def clear(self) -> None:
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.cache_dir.exists():
+            for path in self.cache_dir.glob("*.pkl"):
+                path.unlink(missing_ok=True)
+
+    def _remember(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pkl"
+
+    def _evict_disk(self) -> None:
+        entries = []
+        for path in self.cache_dir.glob("*.pkl"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total_bytes <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_bytes -= size
+
+
+default_cache = ResultCache()
+
+
+def implementation_fingerprint(func: Callable) -> str:
+    """
+    Fingerprint of the source code behind ``func``.
+
+    Every module of the package that defines ``func`` is hashed, so a change
+    to the function or to any helper it relies on (interval bounds, resampling
+    kernels, ...) invalidates results cached by the previous code.
+
+    Parameters
+    ----------
+    func : Callable
+        The cached function.
+
+    Returns
+    -------
+    str
+        Hex digest of the package sources.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    try:
+        package_dir = Path(inspect.getfile(func)).parent
+        for path in sorted(package_dir.glob("*.py")):
+            hasher.update(path.name.encode())
+            hasher.update(path.read_bytes())
+    except (OSError, TypeError):
+        hasher.update(inspect.getsource(func).encode())
+    return hasher.hexdigest()
+
+
+def _is_fixed_seed(seed: Any) -> bool:
+    return isinstance(seed, (int, np.integer)) and not isinstance(seed, bool)
+
+
+def cached_result(
+    func: Optional[Callable] = None,
+    *,
+    cache: Optional[ResultCache] = None,
+    seed_arg: str = "seed",
+) -> Callable:
+    """
+    Decorator that memoizes a statistical function on its inputs.
+
+    The key is built from the function name, ``CACHE_VERSION``, the
+    ``implementation_fingerprint`` of the function and the fingerprint of
+    every bound argument (defaults included), so changing the code, the data
+    or any parameter (``ci``, ``n_bootstraps``, ``seed``, ...) produces a new
+    key. Only calls with an integer seed are reproducible, so calls with
+    ``seed=None`` or a ``np.random.Generator`` are never cached. Pass
+    ``use_cache=False`` to bypass the cache for one call.
+
+    Parameters
+    ----------
+    func : Callable, optional
+        Function to decorate.
+    cache : ResultCache, optional
+        Cache instance to use. Defaults to the module-level ``default_cache``.
+    seed_arg : str
+        Name of the argument controlling randomness.
+
+    Returns
+    -------
+    Callable
+        The memoized function.
+    """
+    if func is None:
+        return functools.partial(cached_result, cache=cache, seed_arg=seed_arg)
+
+    signature = inspect.signature(func)
+    name = f"{func.__module__}.{func.__qualname__}"
+    implementation = implementation_fingerprint(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, use_cache: bool = True, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        if not use_cache or (
+            seed_arg in bound.arguments and not _is_fixed_seed(bound.arguments[seed_arg])
+        ):
+            return func(*args, **kwargs)
+
+        store = cache if cache is not None else default_cache
+        key = fingerprint(
+            (CACHE_VERSION, name, implementation, dict(bound.arguments))
+        )
+        sentinel = object()
+        result = store.get(key, sentinel)
+        if result is sentinel:
+            result = func(*args, **kwargs)
+            store.set(key, result)
+        return result
+
+    return wrapper
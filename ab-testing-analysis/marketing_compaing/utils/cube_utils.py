@@ -0,0 +1,326 @@
+"""
+Segment cube of mergeable summaries for drill-down analysis.
+
+A cube holds, for every combination of the chosen dimensions (e.g.
+MarketSize x week x Promotion), the count, sum, sum of squares, exact minimum
+and maximum of a metric plus a fixed-edge histogram with underflow and
+overflow counts. All of these merge exactly (sums, or min / max), so any
+roll-up or drill-down combines cube cells and t-tests, confidence intervals
+and medians can be answered without touching the raw rows again.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from scipy.stats import t, ttest_ind_from_stats
+
+
+def histogram_columns(n_bins: int) -> list[str]:
+    """
+    Names of the histogram columns of a cube with ``n_bins`` bins.
+    """
+    return [f"hist_{i}" for i in range(n_bins)]
+
+
+def build_segment_cube(
+    df: pd.DataFrame,
+    dims: list[str],
+    value_col: str,
+    bin_edges: Optional[np.ndarray] = None,
+    n_bins: int = 200,
+) -> pd.DataFrame:
+    """
+    Build the cube of per-cell summaries in a single grouping pass.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Raw rows.
+    dims : list of str
+        Dimension columns, e.g. ["MarketSize", "week", "Promotion"].
+    value_col : str
+        Metric column, e.g. "SalesInThousands".
+    bin_edges : np.ndarray, optional
+        Histogram bin edges. Pass the same edges to cubes that will be
+        combined later. Defaults to ``n_bins`` equal-width bins spanning the data.
+    n_bins : int
+        Number of bins used when ``bin_edges`` is not given.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per non-empty cell, indexed by ``dims``, with the columns
+        "count", "sum", "sum_sq", "min", "max", "underflow", "hist_0" ...
+        "hist_{k-1}" and "overflow". Values below the first or above the last
+        edge are counted in "underflow" / "overflow". The bin edges and the
+        metric name are kept in ``cube.attrs``.
+    """
+    values = df[value_col].to_numpy(dtype=float)
+    if bin_edges is None:
+        bin_edges = np.linspace(values.min(), values.max(), n_bins + 1)
+    bin_edges = np.asarray(bin_edges, dtype=float)
+    n_bins = len(bin_edges) - 1
+
+    grouper = df.groupby(dims, observed=True, sort=True)
+    cells = grouper.ngroup().to_numpy()
+    index = grouper.size().index
+    n_cells = len(index)
+
+    # Slot 0 is the underflow, slots 1..n_bins the bins, n_bins + 1 the overflow.
+    slots = np.searchsorted(bin_edges, values, side="right")
+    slots[values == bin_edges[-1]] = n_bins
+    n_slots = n_bins + 2
+    histogram = np.bincount(
+        cells * n_slots + slots, minlength=n_cells * n_slots
+    ).reshape(n_cells, n_slots)
+
+    minimum = np.full(n_cells, np.inf)
+    maximum = np.full(n_cells, -np.inf)
+    np.minimum.at(minimum, cells, values)
+    np.maximum.at(maximum, cells, values)
+
+    cube = pd.DataFrame(
+        histogram,
+        index=index,
+        columns=["underflow"] + histogram_columns(n_bins) + ["overflow"],
+    )
+    cube.insert(0, "count", np.bincount(cells, minlength=n_cells))
+    cube.insert(1, "sum", np.bincount(cells, weights=values, minlength=n_cells))
+    cube.insert(2, "sum_sq", np.bincount(cells, weights=values**2, minlength=n_cells))
+    cube.insert(3, "min", minimum)
+    cube.insert(4, "max", maximum)
+    # Stored as a tuple: pandas compares attrs with == when combining frames.
+    cube.attrs["bin_edges"] = tuple(bin_edges.tolist())
+    cube.attrs["value_col"] = value_col
+    return cube
+
+
+def _combine(grouped) -> pd.DataFrame:
+    """
+    Merge the cube cells of each group: sums add up, extremes take min / max.
+    """
+    combined = grouped.sum()
+    combined["min"] = grouped["min"].min()
+    combined["max"] = grouped["max"].max()
+    return combined
+
+
+def merge_cubes(*cubes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Combine cubes built with the same dimensions and bin edges (e.g. from
+    different periods) by adding their summaries cell by cell.
+
+    Parameters
+    ----------
+    *cubes : pd.DataFrame
+        Cubes to merge.
+
+    Returns
+    -------
+    pd.DataFrame
+        The merged cube.
+    """
+    edges = cubes[0].attrs["bin_edges"]
+    for cube in cubes[1:]:
+        if not np.array_equal(cube.attrs["bin_edges"], edges):
+            raise ValueError("Cubes with different bin edges cannot be merged.")
+    index_names = cubes[0].index.names
+    merged = _combine(pd.concat(cubes).groupby(level=list(index_names), sort=True))
+    merged.attrs = dict(cubes[0].attrs)
+    return merged
+
+
+def rollup_cube(
+    cube: pd.DataFrame, dims: Optional[list[str]] = None, filters: Optional[dict] = None
+) -> pd.DataFrame:
+    """
+    Roll the cube up to ``dims`` after keeping only the cells matching ``filters``.
+
+    Parameters
+    ----------
+    cube : pd.DataFrame
+        Cube from ``build_segment_cube``.
+    dims : list of str, optional
+        Dimensions to keep. None or [] rolls everything up into one "total" row.
+    filters : dict, optional
+        Dimension values to drill down to, e.g. {"MarketSize": "Large"} or
+        {"week": [1, 2]}.
+
+    Returns
+    -------
+    pd.DataFrame
+        Summaries per remaining cell, with the same columns as the cube.
+    """
+    selected = cube
+    if filters:
+        mask = np.ones(len(cube), dtype=bool)
+        for dim, value in filters.items():
+            allowed = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= cube.index.get_level_values(dim).isin(allowed)
+        selected = cube[mask]
+
+    if dims:
+        rolled = _combine(selected.groupby(level=list(dims), sort=True))
+    else:
+        rolled = selected.sum().to_frame("total").T
+        rolled["min"] = selected["min"].min()
+        rolled["max"] = selected["max"].max()
+    rolled.attrs = dict(cube.attrs)
+    return rolled
+
+
+def cube_mean_ci(
+    cube: pd.DataFrame,
+    ci: int = 95,
+    dims: Optional[list[str]] = None,
+    filters: Optional[dict] = None,
+) -> pd.DataFrame:
+    """
+    Mean, standard deviation and t-based confidence interval per roll-up cell.
+
+    Parameters
+    ----------
+    cube : pd.DataFrame
+        Cube from ``build_segment_cube``.
+    ci : int
+        Confidence level (e.g., 95 for 95% CI).
+    dims, filters
+        See ``rollup_cube``.
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns "count", "mean", "std", "ci_lower" and "ci_upper".
+    """
+    rolled = rollup_cube(cube, dims, filters)
+    count = rolled["count"].to_numpy(dtype=float)
+    mean = rolled["sum"].to_numpy() / count
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = (rolled["sum_sq"].to_numpy() - count * mean**2) / (count - 1)
+    std = np.sqrt(np.maximum(variance, 0))
+    margin = t.ppf(1 - (100 - ci) / 200, count - 1) * std / np.sqrt(count)
+    return pd.DataFrame(
+        {
+            "count": rolled["count"],
+            "mean": mean,
+            "std": std,
+            "ci_lower": mean - margin,
+            "ci_upper": mean + margin,
+        },
+        index=rolled.index,
+    )
+
+
+def _histogram_order_statistic(
+    histogram: np.ndarray, edges: np.ndarray, rank: np.ndarray
+) -> np.ndarray:
+    """
+    Estimate the value of 0-based ``rank`` in every row of ``histogram``.
+
+    Values are assumed to be spread evenly inside their bin, so the
+    estimate lies in the bin that holds that rank. ``edges`` holds the bin
+    edges of each row.
+    """
+    cumulative = np.cumsum(histogram, axis=1)
+    bins = np.argmax(cumulative > rank[:, np.newaxis], axis=1)
+    rows = np.arange(len(histogram))
+    below = np.where(bins > 0, cumulative[rows, np.maximum(bins - 1, 0)], 0.0)
+    in_bin = histogram[rows, bins]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(in_bin > 0, (rank - below + 0.5) / in_bin, 0.0)
+    lower = edges[rows, bins]
+    return lower + fraction * (edges[rows, bins + 1] - lower)
+
+
+def cube_quantile(
+    cube: pd.DataFrame,
+    q: float = 0.5,
+    dims: Optional[list[str]] = None,
+    filters: Optional[dict] = None,
+) -> pd.Series:
+    """
+    Quantile per roll-up cell, interpolated between the order statistics at
+    ranks floor((n - 1) q) and ceil((n - 1) q) like ``np.quantile`` (and
+    ``np.median`` for q=0.5). Each order statistic is estimated inside the
+    histogram bin that holds it, so for values within the bin edges the
+    error is at most one bin width. Underflow and overflow values are
+    treated as one extra bin reaching to the exact minimum / maximum, which
+    is much coarser; keep the bin edges wide enough for the data.
+
+    Parameters
+    ----------
+    cube : pd.DataFrame
+        Cube from ``build_segment_cube``.
+    q : float
+        Quantile to compute, 0.5 for the median.
+    dims, filters
+        See ``rollup_cube``.
+
+    Returns
+    -------
+    pd.Series
+        Estimated quantile per roll-up cell.
+    """
+    rolled = rollup_cube(cube, dims, filters)
+    edges = np.asarray(cube.attrs["bin_edges"])
+    columns = ["underflow"] + histogram_columns(len(edges) - 1) + ["overflow"]
+    histogram = rolled[columns].to_numpy(dtype=float)
+    minimum = np.minimum(rolled["min"].to_numpy(dtype=float), edges[0])
+    maximum = np.maximum(rolled["max"].to_numpy(dtype=float), edges[-1])
+    edges = np.column_stack(
+        [minimum, np.broadcast_to(edges, (len(rolled), len(edges))), maximum]
+    )
+    count = histogram.sum(axis=1)
+
+    position = np.maximum(count - 1, 0) * q
+    lower_rank = np.floor(position)
+    upper_rank = np.minimum(lower_rank + 1, np.maximum(count - 1, 0))
+    lower_value = _histogram_order_statistic(histogram, edges, lower_rank)
+    upper_value = _histogram_order_statistic(histogram, edges, upper_rank)
+    quantile = lower_value + (position - lower_rank) * (upper_value - lower_value)
+    quantile[count == 0] = np.nan
+    return pd.Series(quantile, index=rolled.index, name=f"q{q:g}")
+
+
+def perform_t_tests_from_cube(
+    cube: pd.DataFrame,
+    group_dim: str,
+    filters: Optional[dict] = None,
+    equal_var: bool = True,
+) -> dict:
+    """
+    Perform t-tests between all pairs of ``group_dim`` values from the cube
+    summaries; the counterpart of ``stats_utils.perform_t_tests``.
+
+    Parameters
+    ----------
+    cube : pd.DataFrame
+        Cube from ``build_segment_cube``.
+    group_dim : str
+        Dimension holding the groups, e.g. "Promotion".
+    filters : dict, optional
+        Slice to test in, e.g. {"MarketSize": "Large"}.
+    equal_var : bool
+        Student's t-test if True, Welch's t-test otherwise.
+
+    Returns
+    -------
+    dict
+        Dictionary with t-statistics and p-values for each pair of groups.
+    """
+    stats = cube_mean_ci(cube, dims=[group_dim], filters=filters)
+    groups = stats.index.tolist()
+    results = {}
+
+    for i in range(len(groups)):
+        for j in range(i + 1, len(groups)):
+            first = stats.loc[groups[i]]
+            second = stats.loc[groups[j]]
+            t_stat, p_value = ttest_ind_from_stats(
+                first["mean"], first["std"], first["count"],
+                second["mean"], second["std"], second["count"],
+                equal_var=equal_var,
+            )
+            results[f"{groups[i]} vs {groups[j]}"] = {"t_stat": t_stat, "p_value": p_value}
+
+    return results
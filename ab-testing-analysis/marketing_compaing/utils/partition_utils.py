@@ -0,0 +1,222 @@
+"""
+Incremental per-period summary store.
+
+Each period (e.g. a value of the ``week`` column or one daily export) is
+summarized once into a segment cube (see ``cube_utils``) keyed by arm and
+persisted to disk. New data only costs a pass over its own rows; cumulative
+results are answered by merging the stored period cubes.
+"""
+import json
+import warnings
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .cube_utils import build_segment_cube, merge_cubes
+
+METADATA_FILE = "metadata.json"
+
+
+def _read_metadata(store_dir: Path) -> Optional[dict]:
+    path = store_dir / METADATA_FILE
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _period_path(store_dir: Path, period) -> Path:
+    label = "".join(c if c.isalnum() or c in "-_." else "_" for c in str(period))
+    return store_dir / f"period={label}.pkl"
+
+
+def _read_period_cube(path: Path, period) -> pd.DataFrame:
+    """
+    Read a stored period cube, checking that the file belongs to ``period``
+    and not to another period with the same sanitized label (e.g. 1 and "1").
+    """
+    cube = pd.read_pickle(path)
+    stored, requested = (
+        value.item() if isinstance(value, np.generic) else value
+        for value in (cube.attrs["period"], period)
+    )
+    if type(stored) is not type(requested) or stored != requested:
+        raise ValueError(
+            f"Period {period!r} maps to {path.name}, which already stores period "
+            f"{stored!r}; rename one of the periods."
+        )
+    return cube
+
+
+def update_partition_store(
+    store_dir: str,
+    df: pd.DataFrame,
+    period_col: str,
+    arm_col: str,
+    value_col: str,
+    dims: Optional[list[str]] = None,
+    bin_edges: Optional[np.ndarray] = None,
+    if_exists: str = "skip",
+) -> list:
+    """
+    Summarize the periods in ``df`` that are not stored yet.
+
+    The schema (columns, dimensions and histogram bin edges) is fixed by the
+    first call; later calls must use the same columns so that period cubes
+    stay mergeable. The edges cannot grow afterwards, so choose them to cover
+    every future period. Values outside them are counted as underflow /
+    overflow and make cumulative quantiles coarse; a warning is raised when
+    that happens.
+
+    Parameters
+    ----------
+    store_dir : str
+        Directory of the store, created if needed.
+    df : pd.DataFrame
+        New rows, typically a single period's export.
+    period_col : str
+        Column identifying the period, e.g. "week".
+    arm_col : str
+        Column identifying the arm, e.g. "Promotion".
+    value_col : str
+        Metric column, e.g. "SalesInThousands".
+    dims : list of str, optional
+        Extra dimensions kept in the period cubes, e.g. ["MarketSize"].
+    bin_edges : np.ndarray, optional
+        Histogram bin edges, required when the store is created.
+    if_exists : str
+        What to do with rows of a period that is already stored:
+        "skip" ignores them with a warning, "append" merges them into the
+        stored cube (e.g. a partial week or a late export; appending the same
+        rows twice counts them twice) and "overwrite" replaces the stored
+        cube with a summary of these rows only (e.g. after a full
+        re-export of a corrected period).
+
+    Returns
+    -------
+    list
+        The periods that were summarized and written.
+    """
+    if if_exists not in ("skip", "append", "overwrite"):
+        raise ValueError(
+            f"Unknown if_exists '{if_exists}', use 'skip', 'append' or 'overwrite'."
+        )
+    store_dir = Path(store_dir)
+    cube_dims = [arm_col] + list(dims or [])
+    metadata = _read_metadata(store_dir)
+
+    if metadata is None:
+        if bin_edges is None:
+            raise ValueError(
+                "bin_edges are required to create a store, e.g. "
+                "np.linspace(0, 200, 401) for a metric expected within [0, 200]."
+            )
+        metadata = {
+            "period_col": period_col,
+            "value_col": value_col,
+            "dims": cube_dims,
+            "bin_edges": np.asarray(bin_edges, dtype=float).tolist(),
+        }
+        store_dir.mkdir(parents=True, exist_ok=True)
+        with open(store_dir / METADATA_FILE, "w") as f:
+            json.dump(metadata, f, indent=2)
+    elif (metadata["period_col"], metadata["value_col"], metadata["dims"]) != (
+        period_col,
+        value_col,
+        cube_dims,
+    ):
+        raise ValueError(
+            f"The store at {store_dir} summarizes {metadata['value_col']} by "
+            f"{metadata['period_col']} and {metadata['dims']}."
+        )
+    edges = np.asarray(metadata["bin_edges"])
+
+    written = []
+    for period, rows in df.groupby(period_col, sort=True):
+        path = _period_path(store_dir, period)
+        stored = _read_period_cube(path, period) if path.exists() else None
+        if stored is not None and if_exists == "skip":
+            warnings.warn(
+                f"Period {period} is already stored; its {len(rows)} new rows were "
+                "skipped. Use if_exists='append' or 'overwrite' to keep them.",
+                stacklevel=2,
+            )
+            continue
+        cube = build_segment_cube(rows, cube_dims, value_col, bin_edges=edges)
+        n_outside = int(cube["underflow"].sum() + cube["overflow"].sum())
+        if n_outside:
+            warnings.warn(
+                f"{n_outside} {value_col} values of period {period} lie outside the "
+                f"store's bin edges [{edges[0]}, {edges[-1]}]; cumulative quantiles "
+                "will be coarse.",
+                stacklevel=2,
+            )
+        cube.attrs["period"] = period
+        if stored is not None and if_exists == "append":
+            cube = merge_cubes(stored, cube)
+        cube.to_pickle(path)
+        written.append(period)
+
+    return written
+
+
+def load_period_cubes(store_dir: str, periods: Optional[list] = None) -> dict:
+    """
+    Load the stored period cubes.
+
+    Parameters
+    ----------
+    store_dir : str
+        Directory of the store.
+    periods : list, optional
+        Periods to load. Defaults to all stored periods.
+
+    Returns
+    -------
+    dict
+        Period cubes keyed by period, in period order.
+    """
+    store_dir = Path(store_dir)
+    if _read_metadata(store_dir) is None:
+        raise FileNotFoundError(f"No partition store found at {store_dir}.")
+
+    cubes = {}
+    if periods is None:
+        for path in store_dir.glob("period=*.pkl"):
+            cube = pd.read_pickle(path)
+            cubes[cube.attrs["period"]] = cube
+    else:
+        for period in periods:
+            cubes[period] = _read_period_cube(_period_path(store_dir, period), period)
+    return dict(sorted(cubes.items()))
+
+
+def cumulative_cube(store_dir: str, periods: Optional[list] = None) -> pd.DataFrame:
+    """
+    Merge the stored period cubes into one cube over all (or the given) periods.
+
+    The result can be passed to ``cube_utils.cube_mean_ci``,
+    ``cube_utils.cube_quantile`` or ``cube_utils.perform_t_tests_from_cube``
+    to get cumulative test results without reprocessing history.
+
+    Parameters
+    ----------
+    store_dir : str
+        Directory of the store.
+    periods : list, optional
+        Periods to include. Defaults to all stored periods.
+
+    Returns
+    -------
+    pd.DataFrame
+        The merged cube, indexed by the arm and any extra dimensions.
+    """
+    cubes = load_period_cubes(store_dir, periods)
+    if not cubes:
+        raise ValueError(f"No periods stored in {store_dir}.")
+    merged = merge_cubes(*cubes.values())
+    merged.attrs.pop("period", None)
+    merged.attrs["periods"] = list(cubes)
+    return merged
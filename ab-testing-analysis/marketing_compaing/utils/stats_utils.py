@@ -3,9 +3,15 @@
 A collection of statistical utility functions for hypothesis testing, confidence
 interval estimation, bootstrap resampling, etc.
 """
+from typing import Optional
+
 import numpy as np
 import pandas as pd
-from scipy.stats import ttest_ind
+from scipy.stats import beta, norm, ttest_ind, ttest_ind_from_stats
+
+from .array_utils import array_moments
+from .cache_utils import cached_result
+from .kernel_utils import draw_row_seeds, resample_batch_size, resample_medians
 
 def perform_t_tests(df, group_col, value_col):
     """
@@ -38,18 +44,183 @@ def perform_t_tests(df, group_col, value_col):
     
     return results
 
-def bootstrap_median_ci(group: pd.Series, ci: int, n_bootstraps: int = 1000) -> tuple[float, float, float]:
+def perform_t_tests_arrays(arms: dict, equal_var: bool = True) -> dict:
+    """
+    Perform t-tests between all pairs of per-arm metric arrays.
+
+    The arrays (e.g. compact or memory-mapped ones from
+    ``array_utils.load_arm_arrays``) are streamed in chunks, so arms larger
+    than RAM can be tested.
+
+    Parameters:
+    -----------
+    arms : dict
+        Metric values per arm.
+    equal_var : bool
+        Student's t-test if True, Welch's t-test otherwise.
+
+    Returns:
+    --------
+    results : dict
+        Dictionary with t-statistics and p-values for each pair of arms.
+    """
+    moments = {arm: array_moments(values) for arm, values in arms.items()}
+    groups = list(moments)
+    results = {}
+
+    for i in range(len(groups)):
+        for j in range(i + 1, len(groups)):
+            n1, mean1, var1 = moments[groups[i]]
+            n2, mean2, var2 = moments[groups[j]]
+            t_stat, p_value = ttest_ind_from_stats(
+                mean1, np.sqrt(var1), n1, mean2, np.sqrt(var2), n2, equal_var=equal_var
+            )
+            results[f'{groups[i]} vs {groups[j]}'] = {'t_stat': t_stat, 'p_value': p_value}
+
+    return results
+
+def _check_jackknife_size(n: int) -> None:
+    """
+    The jackknife needs at least two observations to leave one out.
+    """
+    if n < 2:
+        raise ValueError(
+            f"BCa intervals need at least 2 observations per group, got {n}."
+        )
+
+
+def jackknife_means(values: np.ndarray) -> np.ndarray:
+    """
+    Leave-one-out means in O(n) from the total sum.
+
+    Parameters:
+    -----------
+    values : np.ndarray
+        Sample values.
+
+    Returns:
+    --------
+    np.ndarray
+        The mean of the sample with observation ``i`` removed, for every ``i``.
+    """
+    values = np.asarray(values, dtype=float)
+    _check_jackknife_size(len(values))
+    return (values.sum() - values) / (len(values) - 1)
+
+
+def jackknife_medians(values: np.ndarray) -> np.ndarray:
+    """
+    Leave-one-out medians from a single sort.
+
+    Removing the observation at sorted position ``i`` shifts every later order
+    statistic down by one, so the median of the remaining ``n - 1`` values is
+    read directly from the sorted array instead of being recomputed ``n`` times.
+    The result is in sorted order, which is all the jackknife acceleration needs.
+
+    Parameters:
+    -----------
+    values : np.ndarray
+        Sample values.
+
+    Returns:
+    --------
+    np.ndarray
+        Leave-one-out medians, one per observation.
+    """
+    sorted_values = np.sort(np.asarray(values, dtype=float))
+    _check_jackknife_size(len(sorted_values))
+    removed = np.arange(len(sorted_values))
+    m = len(sorted_values) - 1
+
+    def order_statistic(k: int) -> np.ndarray:
+        return np.where(k < removed, sorted_values[k], sorted_values[k + 1])
+
+    if m % 2:
+        return order_statistic(m // 2)
+    return (order_statistic(m // 2 - 1) + order_statistic(m // 2)) / 2
+
+
+def _bca_acceleration(jackknife_samples: list[np.ndarray]) -> float:
+    """
+    Acceleration term from the jackknife values of each independent sample.
+    """
+    numerator = 0.0
+    denominator = 0.0
+    for jackknife in jackknife_samples:
+        deviations = jackknife.mean() - jackknife
+        numerator += np.sum(deviations**3)
+        denominator += np.sum(deviations**2)
+    if denominator == 0:
+        return 0.0
+    return numerator / (6 * denominator**1.5)
+
+
+def _confidence_bounds(
+    bootstrap_stats: np.ndarray,
+    ci: int,
+    method: str,
+    theta_hat: float = None,
+    jackknife_samples: list[np.ndarray] = None,
+) -> tuple[float, float]:
+    """
+    Percentile or BCa (bias-corrected and accelerated) interval bounds.
+    """
+    bootstrap_stats = np.asarray(bootstrap_stats)
+    tail = (100 - ci) / 2
+    if method == "percentile":
+        return (
+            np.percentile(bootstrap_stats, tail),
+            np.percentile(bootstrap_stats, 100 - tail),
+        )
+    if method != "bca":
+        raise ValueError(f"Unknown method '{method}', use 'percentile' or 'bca'.")
+
+    n = len(bootstrap_stats)
+    proportion = (
+        np.sum(bootstrap_stats < theta_hat) + 0.5 * np.sum(bootstrap_stats == theta_hat)
+    ) / n
+    z0 = norm.ppf(np.clip(proportion, 0.5 / n, 1 - 0.5 / n))
+    acceleration = _bca_acceleration(jackknife_samples)
+    z = norm.ppf([tail / 100, 1 - tail / 100])
+    denominator = 1 - acceleration * (z0 + z)
+    if np.any(denominator <= 0):
+        # The BCa map is no longer monotone and would return lower > upper.
+        raise ValueError(
+            f"BCa is undefined for acceleration {acceleration:.3g} and bias "
+            f"correction {z0:.3g}; use method='percentile'."
+        )
+    adjusted = norm.cdf(z0 + (z0 + z) / denominator)
+    ci_lower, ci_upper = np.percentile(bootstrap_stats, 100 * adjusted)
+    return ci_lower, ci_upper
+
+
+@cached_result
+def bootstrap_median_ci(
+    group: pd.Series,
+    ci: int,
+    n_bootstraps: int = 1000,
+    seed: Optional[int] = None,
+    method: str = "percentile",
+) -> tuple[float, float, float]:
     """
     Calculate the median value and confidence interval using bootstrapping.
 
     Parameters:
     -----------
     group : array-like
-        Data for the group.
+        Data for the group. Compact or memory-mapped arrays from
+        ``array_utils`` are used without copying, but every resample is
+        buffered, so the group must fit in memory.
     n_bootstraps : int
         Number of bootstrap samples.
     ci : int
         Confidence level (e.g., 95 for 95% CI).
+    seed : int, optional
+        Seed for the random generator. Seeded calls are cached, see
+        ``cache_utils.cached_result``.
+    method : str
+        "percentile" or "bca". BCa intervals correct for bias and skewness and
+        keep their coverage with fewer replicates on skewed metrics.
 
     Returns:
     --------
@@ -60,28 +231,56 @@ def bootstrap_median_ci(group: pd.Series, ci: int, n_bootstraps: int = 1000) ->
     ci_upper : float
         Upper bound of the confidence interval.
     """
-    bootstrap_median = []
-    for _ in range(n_bootstraps):
-        resampled = group.sample(len(group), replace=True)
-        bootstrap_median.append(np.median(resampled))
+    values = np.asarray(group)
+    if method == "bca":
+        _check_jackknife_size(len(values))
+    rng = np.random.default_rng(seed)
+    n = len(values)
+    bootstrap_median = np.empty(n_bootstraps)
+    batch_size = resample_batch_size(n, n_bootstraps)
+    for start in range(0, n_bootstraps, batch_size):
+        size = min(batch_size, n_bootstraps - start)
+        row_seeds = draw_row_seeds(rng, size)
+        bootstrap_median[start:start + size] = resample_medians(values, row_seeds, n)
     median_val = np.median(bootstrap_median)
-    ci_lower = np.percentile(bootstrap_median, (100 - ci) / 2)
-    ci_upper = np.percentile(bootstrap_median, 100 - ((100 - ci) / 2))
+    ci_lower, ci_upper = _confidence_bounds(
+        bootstrap_median,
+        ci,
+        method,
+        theta_hat=np.median(values) if method == "bca" else None,
+        jackknife_samples=[jackknife_medians(values)] if method == "bca" else None,
+    )
 
     return median_val, ci_lower, ci_upper
 
-def bootstrap_median_difference_ci(group1: pd.Series, group2: pd.Series, ci: int, n_bootstraps: int = 1000) -> tuple[float, float, float]:
+@cached_result
+def bootstrap_median_difference_ci(
+    group1: pd.Series,
+    group2: pd.Series,
+    ci: int,
+    n_bootstraps: int = 1000,
+    seed: Optional[int] = None,
+    method: str = "percentile",
+) -> tuple[float, float, float]:
     """
     Calculate the median difference and confidence interval using bootstrapping.
 
     Parameters:
     -----------
     group1, group2 : array-like
-        Data for the two groups.
+        Data for the two groups. Compact or memory-mapped arrays from
+        ``array_utils`` are used without copying, but every resample is
+        buffered, so the groups must fit in memory.
     ci : int
         Confidence level (e.g., 95 for 95% CI).
     n_bootstraps : int
         Number of bootstrap samples.
+    seed : int, optional
+        Seed for the random generator. Seeded calls are cached, see
+        ``cache_utils.cached_result``.
+    method : str
+        "percentile" or "bca". BCa intervals correct for bias and skewness and
+        keep their coverage with fewer replicates on skewed metrics.
 
     Returns:
     --------
@@ -92,13 +291,152 @@ def bootstrap_median_difference_ci(group1: pd.Series, group2: pd.Series, ci: int
     ci_upper : float
         Upper bound of the confidence interval.
     """
-    bootstrap_differences = []
-    for _ in range(n_bootstraps):
-        resample1 = group1.sample(len(group1), replace=True)
-        resample2 = group2.sample(len(group2), replace=True)
-        bootstrap_differences.append(np.median(resample1) - np.median(resample2))
-    ci_lower = np.percentile(bootstrap_differences, (100 - ci) / 2)
-    ci_upper = np.percentile(bootstrap_differences, 100 - ((100 - ci) / 2))
+    values1 = np.asarray(group1)
+    values2 = np.asarray(group2)
+    if method == "bca":
+        _check_jackknife_size(min(len(values1), len(values2)))
+    rng = np.random.default_rng(seed)
+    n1 = len(values1)
+    n2 = len(values2)
+    bootstrap_differences = np.empty(n_bootstraps)
+    batch_size = resample_batch_size(max(n1, n2), n_bootstraps)
+    for start in range(0, n_bootstraps, batch_size):
+        size = min(batch_size, n_bootstraps - start)
+        row_seeds1 = draw_row_seeds(rng, size)
+        row_seeds2 = draw_row_seeds(rng, size)
+        bootstrap_differences[start:start + size] = resample_medians(
+            values1, row_seeds1, n1
+        ) - resample_medians(values2, row_seeds2, n2)
+    theta_hat = None
+    jackknife_samples = None
+    if method == "bca":
+        median1 = np.median(values1)
+        median2 = np.median(values2)
+        theta_hat = median1 - median2
+        jackknife_samples = [
+            jackknife_medians(values1) - median2,
+            median1 - jackknife_medians(values2),
+        ]
+    ci_lower, ci_upper = _confidence_bounds(
+        bootstrap_differences, ci, method, theta_hat, jackknife_samples
+    )
     median_diff = np.median(bootstrap_differences)
 
     return median_diff, ci_lower, ci_upper
+
+
+PERMUTATION_BLOCK_ELEMENTS = 2**23
+
+
+def _group_difference(block: np.ndarray, n1: int, statistic: str) -> np.ndarray:
+    """
+    Evaluate the group-1 minus group-2 statistic for every row of a 2-D block
+    whose first ``n1`` columns hold group 1.
+    """
+    if statistic == "mean":
+        sum1 = block[:, :n1].sum(axis=1)
+        sum2 = block.sum(axis=1) - sum1
+        return sum1 / n1 - sum2 / (block.shape[1] - n1)
+    if statistic == "median":
+        return np.median(block[:, :n1], axis=1) - np.median(block[:, n1:], axis=1)
+    raise ValueError(f"Unknown statistic '{statistic}', use 'mean' or 'median'.")
+
+
+@cached_result
+def permutation_test(
+    group1: pd.Series,
+    group2: pd.Series,
+    statistic: str = "mean",
+    alternative: str = "two-sided",
+    n_permutations: int = 10000,
+    batch_size: int = 500,
+    alpha: float = 0.05,
+    early_stopping: bool = True,
+    error_rate: float = 0.001,
+    seed: Optional[int] = None,
+) -> tuple[float, float, int]:
+    """
+    Permutation test for the difference in means or medians of two groups.
+
+    Label shuffles are generated in batches and the statistic is evaluated on
+    the whole 2-D batch at once. With ``early_stopping`` the test stops as soon
+    as a Clopper-Pearson interval for the Monte Carlo p-value lies entirely
+    above or below ``alpha``; the interval level is Bonferroni-adjusted over
+    all batches so the decision is wrong with probability at most ``error_rate``.
+
+    Parameters:
+    -----------
+    group1, group2 : array-like
+        Data for the two groups.
+    statistic : str
+        Either "mean" or "median".
+    alternative : str
+        "two-sided", "greater" (group1 > group2) or "less".
+    n_permutations : int
+        Maximum number of permutations.
+    batch_size : int
+        Number of permutations evaluated per batch. It is reduced for large
+        groups to bound memory use.
+    alpha : float
+        Significance level used by the stopping rule.
+    early_stopping : bool
+        Whether to stop once the decision at ``alpha`` is settled.
+    error_rate : float
+        Probability that early stopping reaches the wrong decision.
+    seed : int, optional
+        Seed for the random generator.
+
+    Returns:
+    --------
+    observed_diff : float
+        Observed difference of the statistic (group1 - group2).
+    p_value : float
+        Monte Carlo permutation p-value.
+    n_used : int
+        Number of permutations actually evaluated.
+    """
+    if alternative not in ("two-sided", "greater", "less"):
+        raise ValueError(
+            f"Unknown alternative '{alternative}', use 'two-sided', 'greater' or 'less'."
+        )
+    values1 = np.asarray(group1)
+    values2 = np.asarray(group2)
+    n1 = len(values1)
+    pooled = np.concatenate([values1, values2])
+    observed_diff = float(_group_difference(pooled[np.newaxis, :], n1, statistic)[0])
+    # Permuted statistics are summed in a different order than the observed
+    # one, so exact ties can differ by rounding; compare with a relative
+    # tolerance as scipy.stats.permutation_test does.
+    tolerance = abs(observed_diff) * 100 * np.finfo(float).eps
+
+    batch_size = max(1, min(batch_size, PERMUTATION_BLOCK_ELEMENTS // len(pooled)))
+    n_batches = -(-n_permutations // batch_size)
+    tail = (error_rate / n_batches) / 2
+    rng = np.random.default_rng(seed)
+
+    n_extreme = 0
+    n_used = 0
+    while n_used < n_permutations:
+        size = min(batch_size, n_permutations - n_used)
+        block = rng.permuted(np.broadcast_to(pooled, (size, len(pooled))), axis=1)
+        diffs = _group_difference(block, n1, statistic)
+        if alternative == "two-sided":
+            n_extreme += int(np.sum(np.abs(diffs) >= abs(observed_diff) - tolerance))
+        elif alternative == "greater":
+            n_extreme += int(np.sum(diffs >= observed_diff - tolerance))
+        else:
+            n_extreme += int(np.sum(diffs <= observed_diff + tolerance))
+        n_used += size
+
+        if early_stopping and n_used < n_permutations:
+            lower = beta.ppf(tail, n_extreme, n_used - n_extreme + 1) if n_extreme else 0.0
+            upper = (
+                beta.ppf(1 - tail, n_extreme + 1, n_used - n_extreme)
+                if n_extreme < n_used
+                else 1.0
+            )
+            if upper < alpha or lower > alpha:
+                break
+
+    p_value = (n_extreme + 1) / (n_used + 1)
+    return observed_diff, p_value, n_used
@@ -3,6 +3,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from .kernel_utils import outside_bounds_mask
+
 FIGURE_SIZE = (8, 6)
 
 def get_outliers_mask_iqr(ds: pd.Series) -> pd.Series:
@@ -22,7 +24,10 @@ def get_outliers_mask_iqr(ds: pd.Series) -> pd.Series:
     lower_bound = q1 - 1.5 * iqr
     upper_bound = q3 + 1.5 * iqr
 
-    return (ds < lower_bound) | (ds > upper_bound)
+    mask = outside_bounds_mask(
+        ds.to_numpy(dtype=float)[:, None], [lower_bound], [upper_bound]
+    )
+    return pd.Series(mask, index=ds.index)
 
 def draw_histplot(
     data: pd.Series,